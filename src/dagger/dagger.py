@@ -3,12 +3,130 @@ Module for all the wrapper classes that will place the wrapped Python functions
 into their own scripts, and within a DAG framework via HTCondor DAGMAN.
 """
 
+from __future__ import annotations
+
+import concurrent.futures
+import functools
 import inspect
+import linecache
+import logging
 import os
-from typing import Optional
+import pathlib
+import types
+from typing import TYPE_CHECKING, Optional
+
+if TYPE_CHECKING:
+    # htcondor2 loads its C extensions on import, so it is only imported where it
+    # is actually needed. This keeps `import dagger` cheap for tooling and docs.
+    import htcondor2
+    from htcondor2 import dags
+
+logger = logging.getLogger(__name__)
+
+# Submit description entries shared by every generated script. The executable and
+# any user-supplied submit variables are merged on top of these. Read-only, so no
+# caller can change the defaults seen by every other builder.
+_SUBMIT_TEMPLATE = types.MappingProxyType(
+    {
+        "universe": "vanilla",
+    }
+)
+
+
+def _getsource(code_obj) -> str:
+    """
+    Return the source text of a code object. Lines are sliced straight out of
+    the linecache entry for the defining file, starting at the code object's
+    first line, and the end of the block is found with `inspect.getblock`.
+    This skips the module and source file resolution that `inspect.getsource`
+    repeats for every call. Falls back to `inspect.getsource` if the file is
+    not available to linecache.
+    """
+    # Drop stale cache entries first (as inspect.findsource does), otherwise a
+    # module edited and reloaded on disk would be sliced with outdated lines
+    linecache.checkcache(code_obj.co_filename)
+    lines = linecache.getlines(code_obj.co_filename)
+    if not lines:
+        return inspect.getsource(code_obj)
+
+    start = code_obj.co_firstlineno - 1
+    return "".join(inspect.getblock(lines[start:]))
+
+
+@functools.lru_cache(maxsize=512)
+def _parse_cached(
+    code_obj,
+    filename: str,
+    firstlineno: int,
+    trim_whitespace: bool,
+    return_as_string: bool,
+):
+    """
+    Retrieve and format the source of a code object. Results are memoized on
+    the code object, so wrapping the same function into several layers (or
+    several DAGs) only reads and parses its source once.
+
+    Code objects compare by value and ignore their filename, so two identical
+    functions at the same line of different files would share a cache entry.
+    `filename` and `firstlineno` are passed only to make them part of the key.
+
+    Lists are returned as tuples so the cached value cannot be mutated by the
+    caller; see `DagBuilderBase.parse_function` for the user-facing interface.
+    """
+    source = _getsource(code_obj)
+    # Drop the signature line, keep the body
+    funcstr = source[source.index("\n") + 1 :]
+
+    # signature = inspect.signature(func)
+    # sigstr = f"{name}{signature}:"
+    # funcstr = [sigstr] + funcstr
+
+    if trim_whitespace:
+        # Trim leading whitespace from the function source code
+        # This will not trim _all_ the whitespace, but only the global indentation level
+        # Assume first line is never indented, and use that to determine the indent level.
+        # Lines indented less than that (e.g. inside multi-line strings) are left as is.
+        first_line = funcstr.partition("\n")[0]
+        indent = first_line[: len(first_line) - len(first_line.lstrip())]
+        if indent:
+            funcstr = "\n".join(
+                line.removeprefix(indent) for line in funcstr.split("\n")
+            )
+
+    if return_as_string:
+        return funcstr
+    # Split on "\n" rather than splitlines() so the trailing empty line is kept
+    return tuple(funcstr.split("\n"))
 
-import htcondor2
-from htcondor2 import dags
+
+def _write_script(py_script_name: str, funcstr: str) -> bool:
+    """
+    Write a single generated Python script to disk, unless an identical file is
+    already there. Leaving unchanged scripts alone avoids needless metadata
+    updates on networked filesystems when a DAG is regenerated.
+
+    :return: True if the script was written, False if it was already up to date.
+    """
+    payload = funcstr.encode()
+
+    try:
+        if os.stat(py_script_name).st_size == len(payload):
+            with open(py_script_name, "rb") as f:
+                if f.read() == payload:
+                    return False
+    except FileNotFoundError:
+        pass
+
+    # The payload is already a single encoded buffer, so hand it straight to the
+    # OS rather than going through a buffered file object.
+    fd = os.open(py_script_name, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o666)
+    try:
+        view = memoryview(payload)
+        while view:
+            view = view[os.write(fd, view) :]
+    finally:
+        os.close(fd)
+    return True
 
 
 class DagBuilderBase:
@@ -19,14 +137,26 @@ class DagBuilderBase:
     and DAG layer management.
     """
 
+    __slots__ = (
+        "dag",
+        "_nlayers",
+        "_submit_functions",
+        "_queued_scripts",
+        "_layers",
+        "_pending_writes",
+    )
+
     def __init__(self):
         """Initialize base DAG building state."""
-        self.dag = htcondor2.dags.DAG()
+        from htcondor2 import dags
+
+        self.dag = dags.DAG()
         self._nlayers = 1
         self._submit_functions = {}
-        self._layer_list = []
-        self._job_list = []
-        self._job_names = []
+        self._queued_scripts = set()
+        # Layer name -> NodeLayer, in the order the layers were added
+        self._layers = {}
+        self._pending_writes = {}
 
     def parse_function(
         self,
@@ -74,45 +204,49 @@ class DagBuilderBase:
         if not callable(func):
             raise TypeError("Input must be a callable function.")
 
-        name = func.__name__
-        funcstr = inspect.getsource(func)
-        funcstr = funcstr.split("\n")[1:]
-
-        # signature = inspect.signature(func)
-        # sigstr = f"{name}{signature}:"
-        # funcstr = [sigstr] + funcstr
-
-        if trim_whitespace:
-            # Trim leading whitespace from the function source code
-            # This will not trim _all_ the whitespace, but only the global indentation level
-            # Assume first line is never indented, and use that to determine the indent level
-            indent_level = len(funcstr[0]) - len(funcstr[0].lstrip())
-            funcstr = [line[indent_level:] for line in funcstr]
-
-        if return_as_string:
-            funcstr = "\n".join(funcstr)
+        # Look through functools.wraps-style decorators (and functools.cache) to
+        # the user's function, as inspect.getsource does
+        func = inspect.unwrap(func)
+
+        code = func.__code__
+        funcstr = _parse_cached(
+            code,
+            code.co_filename,
+            code.co_firstlineno,
+            trim_whitespace,
+            return_as_string,
+        )
+        if not return_as_string:
+            # The cached copy is shared between callers, so hand out a fresh list
+            funcstr = list(funcstr)
 
         if return_name:
-            return funcstr, name
+            return funcstr, func.__name__
         else:
             return funcstr
 
     def function_to_submit_obj(
         self,
         func: callable,
-        dag_dir: str,
+        dag_dir: str | os.PathLike,
         py_script_name: str = "",
-        submit_vars: dict = {},
+        submit_vars: Optional[dict] = None,
         delimiter: Optional[str] = None,
     ) -> htcondor2.Submit:
         """
-        Convert a Python function into a HTCondor Submit object.
+        Convert a Python function into a HTCondor Submit object. Converting the same function
+        again with the same script name and delimiter reuses the already queued script, so a
+        function used across several layers is only written out once. A new Submit object is
+        returned on every call, so it can be customised without affecting other layers.
+        The per-job values can be passed in as layer variables, and referenced in
+        `submit_vars` as `$(key)` macros.
 
         :param func: The function to convert.
         :type func: callable
         :param py_script_name: The name of the Python script to create.
                             If not provided, it defaults to the function name with a `.py` extension.
-                            The Python script is created when this function is called. The name can
+                            The Python script is queued when this function is called and written to disk
+                            by `write_scripts` (called automatically by `write_dag`). The name can
                             contain the full path to the script. If only a name is provided, it will be generated
                             in the current directory.
         :type py_script_name: str
@@ -137,40 +271,94 @@ class DagBuilderBase:
         if not callable(func):
             raise TypeError("Input must be a callable function.")
 
-        funcstr, funcname = self.parse_function(
-            func, return_as_string=True, return_name=True
-        )
+        func = inspect.unwrap(func)
+        submit_vars = submit_vars or {}
 
-        if delimiter is not None:
-            # If a delimiter is provided, we will strip out the first and last instances.
-            # This allows embedding arbitrary code into a Python function
-            funcstr = funcstr.strip()
-            funcstr = funcstr.lstrip(delimiter)
-            funcstr = funcstr.rstrip(delimiter)
-            funcstr = funcstr.strip()
-
-        if len(py_script_name) == 0:
-            py_script_name = os.path.join(dag_dir, f"{func.__name__}.py")
-        elif not os.path.isabs(py_script_name):
+        script_path = pathlib.PurePath(py_script_name or f"{func.__name__}.py")
+        if not script_path.is_absolute():
             # If the script name is not absolute, make it relative to the dag_dir
-            py_script_name = os.path.join(dag_dir, py_script_name)
+            script_path = pathlib.PurePath(dag_dir) / script_path
+        py_script_name = str(script_path)
+
+        # The same function added to several layers shares one script; only the
+        # Submit objects (and the per-layer vars) differ between them.
+        code = func.__code__
+        script_key = (code, code.co_filename, py_script_name, delimiter)
+        if script_key in self._queued_scripts:
+            logger.debug("Script %s is already queued", py_script_name)
+        else:
+            funcstr = self.parse_function(func, return_as_string=True)
+
+            if delimiter is not None:
+                # If a delimiter is provided, we will strip out the first and last
+                # instances. This allows embedding arbitrary code into a Python function
+                funcstr = funcstr.strip()
+                funcstr = funcstr.lstrip(delimiter)
+                funcstr = funcstr.rstrip(delimiter)
+                funcstr = funcstr.strip()
 
-        with open(py_script_name, "w") as f:
-            f.write(funcstr)
+            # Defer the write so that all scripts are flushed together by write_scripts
+            self._pending_writes[py_script_name] = funcstr
+            self._queued_scripts.add(script_key)
 
         # This has to be a relative path to the script, not an absolute path
         # because HTCondor will look for the script in the current working directory
         submit_dict = {
-            "executable": os.path.basename(py_script_name),
+            **_SUBMIT_TEMPLATE,
+            "executable": script_path.name,
+            **submit_vars,
         }
-        submit_dict.update(submit_vars)
+
+        import htcondor2
 
         submit_obj = htcondor2.Submit(submit_dict)
 
-        self._submit_functions[funcname] = submit_obj
+        self._submit_functions[func.__name__] = submit_obj
 
         return submit_obj
 
+    def write_scripts(self) -> None:
+        """
+        Write all the Python scripts queued by `function_to_submit_obj` to disk.
+        Scripts are buffered in memory until this is called, and are then written
+        concurrently from a small thread pool, since the writes are independent
+        and I/O bound (particularly on the networked filesystems common in
+        HTCondor pools).
+
+        Every queued script is attempted even if some of the writes fail. Scripts
+        that could not be written stay queued, every failure is logged, and the
+        first error is re-raised.
+
+        :return: None
+        :raises OSError: If any of the scripts could not be written.
+        """
+
+        if not self._pending_writes:
+            return
+
+        max_workers = min(32, len(self._pending_writes))
+        with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as ex:
+            futures = {
+                py_script_name: ex.submit(_write_script, py_script_name, funcstr)
+                for py_script_name, funcstr in self._pending_writes.items()
+            }
+
+        errors = []
+        for py_script_name, future in futures.items():
+            if future.exception() is None:
+                del self._pending_writes[py_script_name]
+                if future.result():
+                    logger.debug("Wrote script %s", py_script_name)
+                else:
+                    logger.debug("Script %s is unchanged, skipped", py_script_name)
+            else:
+                exc = future.exception()
+                logger.error("Could not write %s", py_script_name, exc_info=exc)
+                errors.append(exc)
+
+        if errors:
+            raise errors[0]
+
     def dag_layer(
         self,
         submit_obj: htcondor2.Submit,
@@ -189,7 +377,8 @@ class DagBuilderBase:
         :param submit_vars: Additional arguments to include in the submit script for this layer.
                             This can include command line arguments, Condor requirements, container paths etc.
                             Each dictionary in the list represents a set of variables to be used
-                            for a single job in the layer.
+                            for a single job in the layer. The keys are available as `$(key)` macros in
+                            the submit description, so one Submit object can drive every job in the layer.
         :type submit_vars: list[dict]
 
         :param layer_name: Optional : Name of the layer to create. If not provided,
@@ -217,41 +406,40 @@ class DagBuilderBase:
         >>> dag.dag_layer(parent_layer_name="my_layer")
         """
 
+        import htcondor2
+
         if not isinstance(submit_obj, htcondor2.Submit):
             raise TypeError(
                 "submit_obj must be an instance of htcondor2.Submit or None."
             )
 
-        # Check if parent layer isspecified and exists in the DAG
-        if parent_layer_name and parent_layer_name not in self._layer_list:
-            raise ValueError(
-                f"Parent layer '{parent_layer_name}' does not exist in the DAG. "
-                "Please define it first before adding any children."
-            )
+        # Check if parent layer is specified and exists in the DAG
+        parent_job = None
+        if parent_layer_name:
+            try:
+                parent_job = self._layers[parent_layer_name]
+            except KeyError:
+                raise ValueError(
+                    f"Parent layer '{parent_layer_name}' does not exist in the DAG. "
+                    "Please define it first before adding any children."
+                ) from None
 
         if not layer_name:
             layer_name = f"layer_{self._nlayers}"
 
-        if parent_layer_name:
-            idx = self._layer_list.index(parent_layer_name)
-            job = self._job_list[idx].child_layer(
-                name=layer_name,
-                submit_description=submit_obj,
-                vars=submit_vars,
-                **kwargs,
-            )
-        else:
-            job = self.dag.layer(
-                name=layer_name,
-                submit_description=submit_obj,
-                vars=submit_vars,
-                **kwargs,
-            )
+        add_layer = self.dag.layer if parent_job is None else parent_job.child_layer
+        job = add_layer(
+            name=layer_name,
+            submit_description=submit_obj,
+            vars=submit_vars,
+            **kwargs,
+        )
 
         self._nlayers += 1
-        self._layer_list.append(layer_name)
-        self._job_list.append(job)
-        self._job_names.append(job.name)
+        self._layers[layer_name] = job
+        logger.debug(
+            "Added layer %s (parent: %s)", layer_name, parent_layer_name or None
+        )
 
         return job
 
@@ -262,6 +450,8 @@ class Dagger(DagBuilderBase):
     and add layers to the DAG, define parent/child relationships, and submit the DAG to HTCondor.
     """
 
+    __slots__ = ("dag_dir", "dag_name", "overwrite_dag_dir")
+
     def __init__(self, dag_dir: str, dag_name: str, overwrite_dag_dir: bool = False):
         """
         Initialize the dagger object with a DAG name and directory.
@@ -284,15 +474,15 @@ class Dagger(DagBuilderBase):
         This method creates the DAG directory if it does not exist and initializes
         the DAG object with the specified name.
         """
-        if not os.path.exists(self.dag_dir):
-            os.makedirs(self.dag_dir)
+        os.makedirs(self.dag_dir, exist_ok=True)
 
         if self.overwrite_dag_dir:
             # Clear existing files in the dag_dir if overwrite is enabled
-            for file in os.listdir(self.dag_dir):
-                file_path = os.path.join(self.dag_dir, file)
-                if os.path.isfile(file_path):
-                    os.remove(file_path)
+            logger.debug("Clearing existing files in %s", self.dag_dir)
+            with os.scandir(self.dag_dir) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        os.unlink(entry.path)
 
     @property
     def submit_functions(self) -> dict:
@@ -314,7 +504,7 @@ class Dagger(DagBuilderBase):
         :return: List of layers in the DAG.
         :rtype: list
         """
-        return self._layer_list
+        return list(self._layers)
 
     @property
     def job_list(self) -> list:
@@ -325,7 +515,7 @@ class Dagger(DagBuilderBase):
         :return: List of jobs in the DAG.
         :rtype: list
         """
-        return self._job_list
+        return list(self._layers.values())
 
     @property
     def job_names(self) -> list:
@@ -336,7 +526,7 @@ class Dagger(DagBuilderBase):
         :return: List of job names in the DAG.
         :rtype: list
         """
-        return self._job_names
+        return [job.name for job in self._layers.values()]
 
     def function_to_submit_obj(self, func: callable, **kwargs) -> htcondor2.Submit:
         """User-facing wrapper that automatically provides dag_dir."""
@@ -346,10 +536,10 @@ class Dagger(DagBuilderBase):
         self,
         func: callable,
         py_script_name: str = "",
-        submit_vars: dict = {},
+        submit_vars: Optional[dict] = None,
         layer_name: str = "",
         parent_layer_name: str = "",
-        layer_vars: list[dict] = [],
+        layer_vars: Optional[list[dict]] = None,
         delimiter: Optional[str] = None,
         **kwargs,
     ) -> dags.NodeLayer:
@@ -375,7 +565,7 @@ class Dagger(DagBuilderBase):
         :type parent_layer_name: str
         :param layer_vars: List of dictionaries representing variables to be used for each job in the layer.
                            Each dictionary in the list represents a set of variables to be used
-                           for a single job in the layer.
+                           for a single job in the layer. Reference the keys as `$(key)` macros in `submit_vars`.
         :type layer_vars: list[dict]
         :param kwargs: Additional keyword arguments to pass to the layer creation.
                        This can include any additional parameters supported by htcondor2.dags.NodeLayer.
@@ -404,9 +594,6 @@ class Dagger(DagBuilderBase):
         ... )
         """
 
-        if not callable(func):
-            raise TypeError("Input must be a callable function.")
-
         submit_obj = super().function_to_submit_obj(
             func=func,
             dag_dir=self.dag_dir,
@@ -417,7 +604,7 @@ class Dagger(DagBuilderBase):
 
         return super().dag_layer(
             submit_obj=submit_obj,
-            submit_vars=layer_vars,
+            submit_vars=layer_vars or [],
             layer_name=layer_name,
             parent_layer_name=parent_layer_name,
             **kwargs,
@@ -425,9 +612,9 @@ class Dagger(DagBuilderBase):
 
     def write_dag(self, **kwargs) -> None:
         """
-        Write the current DAG to a file. This will create a .dag file that can be submitted to HTCondor.
-        This is a simple wrapepr around the htcondor2.dags.write_dag method, for ease of use with
-        this class.
+        Write the current DAG to a file. This will create a .dag file that can be submitted to HTCondor,
+        after writing out any Python scripts that are still pending. This is a simple wrapepr around
+        the htcondor2.dags.write_dag method, for ease of use with this class.
 
         :param kwargs: Keyword arguments to pass to the DAG writing function.
                        This can include any parameters supported by htcondor2.dags.write_dag
@@ -439,6 +626,9 @@ class Dagger(DagBuilderBase):
         :return: None
         """
 
+        from htcondor2 import dags
+
+        self.write_scripts()
         dags.write_dag(
             self.dag,
             dag_dir=self.dag_dir,
@@ -469,6 +659,8 @@ class Dagcorator(DagBuilderBase):
         dagcorator.write_dag()
     """
 
+    __slots__ = ("dag_dir", "dag_name", "overwrite_dag_dir")
+
     def __init__(self, dag_dir: str, dag_name: str, overwrite_dag_dir: bool = False):
         """
         Initialize decorator-based DAG builder.
@@ -490,15 +682,15 @@ class Dagcorator(DagBuilderBase):
         """
         Create the DAG directory if it does not exist and clear existing files if requested.
         """
-        if not os.path.exists(self.dag_dir):
-            os.makedirs(self.dag_dir)
+        os.makedirs(self.dag_dir, exist_ok=True)
 
         if self.overwrite_dag_dir:
             # Clear existing files in the dag_dir if overwrite is enabled
-            for file in os.listdir(self.dag_dir):
-                file_path = os.path.join(self.dag_dir, file)
-                if os.path.isfile(file_path):
-                    os.remove(file_path)
+            logger.debug("Clearing existing files in %s", self.dag_dir)
+            with os.scandir(self.dag_dir) as entries:
+                for entry in entries:
+                    if entry.is_file():
+                        os.unlink(entry.path)
 
     def layer(
         self,
@@ -531,21 +723,19 @@ class Dagcorator(DagBuilderBase):
         """
 
         def decorator(func: callable):
-            if not callable(func):
-                raise TypeError("Input must be a callable function.")
-
-            # Use provided layer name or default to function name
-            actual_layer_name = layer_name or func.__name__
-
-            # Create submit object using base class method
+            # Create submit object using base class method. This also validates
+            # that func is callable, so it has to run before func.__name__ is used.
             submit_obj = super(Dagcorator, self).function_to_submit_obj(
                 func=func,
                 dag_dir=self.dag_dir,
                 py_script_name=py_script_name,
-                submit_vars=submit_vars or {},
+                submit_vars=submit_vars,
                 delimiter=delimiter,
             )
 
+            # Use provided layer name or default to function name
+            actual_layer_name = layer_name or func.__name__
+
             # Create DAG layer using base class method
             layer_obj = super(Dagcorator, self).dag_layer(
                 submit_obj=submit_obj,
@@ -581,7 +771,7 @@ class Dagcorator(DagBuilderBase):
         :return: List of layers in the DAG.
         :rtype: list
         """
-        return self._layer_list
+        return list(self._layers)
 
     @property
     def job_list(self) -> list:
@@ -591,7 +781,7 @@ class Dagcorator(DagBuilderBase):
         :return: List of jobs in the DAG.
         :rtype: list
         """
-        return self._job_list
+        return list(self._layers.values())
 
     @property
     def job_names(self) -> list:
@@ -601,16 +791,20 @@ class Dagcorator(DagBuilderBase):
         :return: List of job names in the DAG.
         :rtype: list
         """
-        return self._job_names
+        return [job.name for job in self._layers.values()]
 
     def write_dag(self, **kwargs) -> None:
         """
-        Write the current DAG to a file. This will create a .dag file that can be submitted to HTCondor.
+        Write the current DAG to a file. This will create a .dag file that can be submitted to HTCondor,
+        after writing out any Python scripts that are still pending.
 
         :param kwargs: Keyword arguments to pass to the DAG writing function.
         :type kwargs: dict
         :return: None
         """
+        from htcondor2 import dags
+
+        self.write_scripts()
         dags.write_dag(
             self.dag,
             dag_dir=self.dag_dir,
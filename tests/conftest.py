@@ -0,0 +1,15 @@
+import pytest
+
+
+@pytest.fixture(scope="session")
+def root_tmp(tmp_path_factory):
+    """Single temporary directory shared by the whole test session."""
+    return tmp_path_factory.mktemp("dagger")
+
+
+@pytest.fixture
+def temp_dir(root_tmp, request):
+    """Per-test subdirectory of the shared session directory."""
+    test_dir = root_tmp / request.node.name
+    test_dir.mkdir()
+    return str(test_dir)
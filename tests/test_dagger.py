@@ -1,15 +1,25 @@
+import functools
+import importlib
+import importlib.util
 import os
 import shutil
-import tempfile
+import sys
 
 import htcondor2
+import pytest
+from htcondor2.dags.exceptions import DuplicateNodeName
 
-from dagger.dagger import DagBuilderBase, Dagcorator, Dagger
+from dagger.dagger import DagBuilderBase, Dagcorator, Dagger, _parse_cached
 
 
-def test_base_class_parse_function():
+@pytest.fixture(scope="module")
+def base():
+    """DagBuilderBase shared by tests that only parse functions and do not mutate it."""
+    return DagBuilderBase()
+
+
+def test_base_class_parse_function(base):
     """Test DagBuilderBase.parse_function method."""
-    base = DagBuilderBase()
 
     def sample_function(x: int, y: str) -> str:
         """A sample function to test parsing."""
@@ -20,9 +30,8 @@ def test_base_class_parse_function():
     assert 'return f"Received {x} and {y}"' in func_str
 
 
-def test_base_class_parse_function_as_list():
+def test_base_class_parse_function_as_list(base):
     """Test DagBuilderBase.parse_function method with return_as_string=False."""
-    base = DagBuilderBase()
 
     def another_function(a: float, b: float) -> float:
         """Another sample function to test parsing."""
@@ -33,10 +42,108 @@ def test_base_class_parse_function_as_list():
     assert "return a + b" in func_list[-2]
 
 
-def test_base_class_parse_function_invalid_input():
-    """Test DagBuilderBase.parse_function method with invalid input."""
-    base = DagBuilderBase()
+def test_base_class_parse_function_underindented_string(base):
+    """Test that parse_function output compiles when a string is indented less than the code."""
+
+    def docstring_function(a: int) -> int:
+        """Docstring whose continuation line
+   is indented less than the code."""
+        result = a + 2
+
+    func_str = base.parse_function(docstring_function)
+    compile(func_str, "<docstring_function>", "exec")
+    assert func_str.startswith('"""Docstring')
+
+
+def test_base_class_parse_function_cached(base):
+    """Test that repeated DagBuilderBase.parse_function calls reuse the parsed source."""
+
+    def cached_function(a: int) -> int:
+        return a * 2
+
+    first = base.parse_function(cached_function, return_as_string=False)
+    first.append("# caller modification")
+    second = base.parse_function(cached_function, return_as_string=False)
+
+    assert "# caller modification" not in second
+    assert base.parse_function(cached_function) is base.parse_function(
+        cached_function
+    )
+
+
+def test_base_class_parse_function_shared_cache():
+    """Test that parsed source is shared between DagBuilderBase instances."""
+
+    def shared_function(a: int) -> int:
+        return a + 1
+
+    DagBuilderBase().parse_function(shared_function)
+    hits = _parse_cached.cache_info().hits
+    DagBuilderBase().parse_function(shared_function)
 
+    assert _parse_cached.cache_info().hits == hits + 1
+
+
+def test_base_class_parse_function_wrapped(base):
+    """Test DagBuilderBase.parse_function sees through functools.wraps decorators."""
+
+    def passthrough(f):
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            return f(*args, **kwargs)
+
+        return wrapper
+
+    @passthrough
+    def wrapped_function(a: int) -> int:
+        return a - 1
+
+    @functools.cache
+    def cached_function(a: int) -> int:
+        return a + 3
+
+    assert "return a - 1" in base.parse_function(wrapped_function)
+    assert "return f(*args, **kwargs)" not in base.parse_function(wrapped_function)
+    assert "return a + 3" in base.parse_function(cached_function)
+
+
+def test_base_class_parse_function_same_code_different_files(base, temp_dir):
+    """Test that identical functions from different files are cached separately."""
+    funcs = []
+    for name in ("a", "b"):
+        os.makedirs(os.path.join(temp_dir, name))
+        path = os.path.join(temp_dir, name, "m.py")
+        with open(path, "w") as f:
+            f.write(f"def task():\n    return run()  # from {name}\n")
+        spec = importlib.util.spec_from_file_location(f"m_{name}", path)
+        module = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(module)
+        funcs.append(module.task)
+
+    assert "# from a" in base.parse_function(funcs[0])
+    assert "# from b" in base.parse_function(funcs[1])
+
+
+def test_base_class_parse_function_reloaded_module(
+    base, temp_dir, monkeypatch, request
+):
+    """Test DagBuilderBase.parse_function picks up a module edited and reloaded on disk."""
+    monkeypatch.syspath_prepend(temp_dir)
+    request.addfinalizer(lambda: sys.modules.pop("reload_target", None))
+    path = os.path.join(temp_dir, "reload_target.py")
+    with open(path, "w") as f:
+        f.write("def task():\n    return 'first'\n")
+    module = importlib.import_module("reload_target")
+    assert "return 'first'" in base.parse_function(module.task)
+
+    with open(path, "w") as f:
+        f.write("import os\n\n\n# Moved down\ndef task():\n    return 'second'\n")
+    module = importlib.reload(module)
+    assert "return 'second'" in base.parse_function(module.task)
+
+
+def test_base_class_parse_function_invalid_input(base):
+    """Test DagBuilderBase.parse_function method with invalid input."""
     try:
         base.parse_function("not_a_function")
     except TypeError as e:
@@ -45,21 +152,130 @@ def test_base_class_parse_function_invalid_input():
         assert False, "Expected TypeError was not raised."
 
 
-def test_base_class_function_to_submit_obj():
+def test_base_class_function_to_submit_obj(temp_dir):
     """Test DagBuilderBase.function_to_submit_obj method."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        base = DagBuilderBase()
+    base = DagBuilderBase()
+
+    def test_function(x: int) -> str:
+        return f"Test {x}"
+
+    submit_obj = base.function_to_submit_obj(test_function, temp_dir)
+    assert isinstance(submit_obj, htcondor2.Submit)
+    assert "test_function" in base._submit_functions
+
+    # The Python script is only created once the pending writes are flushed
+    script_path = os.path.join(temp_dir, "test_function.py")
+    assert not os.path.exists(script_path)
+    base.write_scripts()
+    assert os.path.exists(script_path)
+
+
+def test_base_class_function_to_submit_obj_reused(temp_dir):
+    """Test DagBuilderBase.function_to_submit_obj queues a repeated function's script once."""
+    base = DagBuilderBase()
+
+    def test_function(x: int) -> str:
+        return f"Test {x}"
+
+    submit_obj = base.function_to_submit_obj(test_function, temp_dir)
+    base.write_scripts()
+    other_obj = base.function_to_submit_obj(
+        test_function, temp_dir, submit_vars={"request_cpus": "2"}
+    )
+
+    assert other_obj is not submit_obj
+    assert other_obj["executable"] == "test_function.py"
+    assert not base._pending_writes
+
+
+def test_base_class_function_to_submit_obj_independent(temp_dir):
+    """Test that changing a returned Submit object does not affect later calls."""
+    dag = Dagger(dag_dir=temp_dir, dag_name="independent")
+
+    def test_function():
+        pass
+
+    first = dag.function_to_submit_obj(test_function)
+    first["arguments"] = "A"
+    dag.dag_layer(first, [{}], "A")
+
+    second = dag.function_to_submit_obj(test_function)
+    assert "arguments" not in second
+    second["arguments"] = "B"
+    dag.dag_layer(second, [{}], "B")
+    dag.write_dag()
+
+    with open(os.path.join(temp_dir, "A.sub")) as f:
+        assert "arguments = A" in f.read()
+    with open(os.path.join(temp_dir, "B.sub")) as f:
+        assert "arguments = B" in f.read()
+
+
+def test_base_class_write_scripts_error(temp_dir, caplog):
+    """Test DagBuilderBase.write_scripts keeps failed scripts queued and re-raises the error."""
+    base = DagBuilderBase()
+
+    def good_function():
+        pass
+
+    def bad_function():
+        pass
+
+    def other_bad_function():
+        pass
+
+    base.function_to_submit_obj(good_function, temp_dir)
+    base.function_to_submit_obj(
+        bad_function, temp_dir, py_script_name="missing_dir/bad_function.py"
+    )
+    base.function_to_submit_obj(
+        other_bad_function, temp_dir, py_script_name="missing_dir/other_bad.py"
+    )
+
+    try:
+        base.write_scripts()
+    except OSError:
+        pass
+    else:
+        assert False, "Expected OSError was not raised."
+
+    assert os.path.exists(os.path.join(temp_dir, "good_function.py"))
+    assert sorted(base._pending_writes) == [
+        os.path.join(temp_dir, "missing_dir/bad_function.py"),
+        os.path.join(temp_dir, "missing_dir/other_bad.py"),
+    ]
+    # Every failure is logged, not only the one that is re-raised
+    logged = [r.getMessage() for r in caplog.records if r.levelname == "ERROR"]
+    assert len(logged) == 2
+    assert any("bad_function.py" in message for message in logged)
+    assert any("other_bad.py" in message for message in logged)
+
+
+def test_base_class_write_scripts_unchanged(temp_dir):
+    """Test DagBuilderBase.write_scripts leaves identical scripts on disk untouched."""
+
+    def test_function(x: int) -> str:
+        return f"Test {x}"
+
+    base = DagBuilderBase()
+    base.function_to_submit_obj(test_function, temp_dir)
+    base.write_scripts()
 
-        def test_function(x: int) -> str:
-            return f"Test {x}"
+    script_path = os.path.join(temp_dir, "test_function.py")
+    os.utime(script_path, ns=(0, 0))
 
-        submit_obj = base.function_to_submit_obj(test_function, temp_dir)
-        assert isinstance(submit_obj, htcondor2.Submit)
-        assert "test_function" in base._submit_functions
+    base = DagBuilderBase()
+    base.function_to_submit_obj(test_function, temp_dir)
+    base.write_scripts()
+    assert os.stat(script_path).st_mtime_ns == 0
 
-        # Check that the Python script was created
-        script_path = os.path.join(temp_dir, "test_function.py")
-        assert os.path.exists(script_path)
+    with open(script_path, "w") as f:
+        f.write("stale")
+    base = DagBuilderBase()
+    base.function_to_submit_obj(test_function, temp_dir)
+    base.write_scripts()
+    with open(script_path) as f:
+        assert 'return f"Test {x}"' in f.read()
 
 
 def test_base_class_dag_layer():
@@ -70,8 +286,8 @@ def test_base_class_dag_layer():
     layer = base.dag_layer(submit_obj, [{"arg": "value"}], "test_layer")
 
     assert layer.name == "test_layer"
-    assert "test_layer" in base._layer_list
-    assert len(base._job_list) == 1
+    assert "test_layer" in base._layers
+    assert len(base._layers) == 1
     assert base._nlayers == 2
 
 
@@ -89,299 +305,352 @@ def test_base_class_dag_layer_with_parent():
     )
 
     assert child_layer.name == "child_layer"
-    assert "child_layer" in base._layer_list
-    assert len(base._job_list) == 2
+    assert "child_layer" in base._layers
+    assert len(base._layers) == 2
+
+
+def test_base_class_dag_layer_duplicate_name():
+    """Test DagBuilderBase.dag_layer rejects a layer name that is already in use."""
+    base = DagBuilderBase()
+
+    submit_obj = htcondor2.Submit({"executable": "test.py"})
+    base.dag_layer(submit_obj, [{"arg": "value"}], "test_layer")
+
+    for parent_layer_name in ("", "test_layer"):
+        try:
+            base.dag_layer(
+                submit_obj, [{"arg": "other"}], "test_layer", parent_layer_name
+            )
+        except DuplicateNodeName:
+            pass
+        else:
+            assert False, "Expected DuplicateNodeName was not raised."
 
+    assert len(base._layers) == 1
 
-def test_dagger_initialization():
+
+def test_dagger_initialization(temp_dir):
     """Test Dagger class initialization."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        dag = Dagger(dag_dir=temp_dir, dag_name="test")
-        assert dag.dag_name == "test"
-        assert dag.dag_dir == temp_dir
-        assert isinstance(dag.dag, htcondor2.dags.DAG)
-        assert dag._nlayers == 1
-        assert os.path.exists(temp_dir)
+    dag = Dagger(dag_dir=temp_dir, dag_name="test")
+    assert dag.dag_name == "test"
+    assert dag.dag_dir == temp_dir
+    assert isinstance(dag.dag, htcondor2.dags.DAG)
+    assert dag._nlayers == 1
+    assert os.path.exists(temp_dir)
+
 
+def test_dagger_overwrite_dag_dir(temp_dir):
+    """Test Dagger clears existing files, but not directories, when overwrite_dag_dir is set."""
+    stale_file = os.path.join(temp_dir, "stale.py")
+    with open(stale_file, "w") as f:
+        f.write("print('stale')")
+    os.makedirs(os.path.join(temp_dir, "subdir"))
 
-def test_dagger_add_function_to_layer():
+    Dagger(dag_dir=temp_dir, dag_name="test", overwrite_dag_dir=True)
+
+    assert not os.path.exists(stale_file)
+    assert os.path.isdir(os.path.join(temp_dir, "subdir"))
+
+
+def test_dagger_add_function_to_layer(temp_dir):
     """Test Dagger.add_function_to_layer method (high-level wrapper)."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        dag = Dagger(dag_dir=temp_dir, dag_name="test")
+    dag = Dagger(dag_dir=temp_dir, dag_name="test")
 
-        def sample_function(a: int, b: int) -> int:
-            """A sample function to test func_to_layer."""
-            return a + b
+    def sample_function(a: int, b: int) -> int:
+        """A sample function to test func_to_layer."""
+        return a + b
 
-        layer = dag.add_function_to_layer(sample_function, layer_name="addition_layer")
-        assert layer.name == "addition_layer"
-        assert len(dag.layer_list) == 1
-        assert "addition_layer" in dag.layer_list
+    layer = dag.add_function_to_layer(sample_function, layer_name="addition_layer")
+    assert layer.name == "addition_layer"
+    assert len(dag.layer_list) == 1
+    assert "addition_layer" in dag.layer_list
 
 
-def test_dagger_properties():
+def test_dagger_properties(temp_dir):
     """Test Dagger class properties."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        dag = Dagger(dag_dir=temp_dir, dag_name="test")
+    dag = Dagger(dag_dir=temp_dir, dag_name="test")
 
-        def test_func():
-            pass
+    def test_func():
+        pass
 
-        dag.function_to_submit_obj(test_func)
+    dag.function_to_submit_obj(test_func)
 
-        assert "test_func" in dag.submit_functions
-        assert isinstance(dag.layer_list, list)
-        assert isinstance(dag.job_list, list)
-        assert isinstance(dag.job_names, list)
+    assert "test_func" in dag.submit_functions
+    assert isinstance(dag.layer_list, list)
+    assert isinstance(dag.job_list, list)
+    assert isinstance(dag.job_names, list)
 
 
-def test_dagger_write_dag():
+def test_dagger_write_dag(temp_dir):
     """Test Dagger.write_dag method."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        dag = Dagger(dag_dir=temp_dir, dag_name="test_dag")
+    dag = Dagger(dag_dir=temp_dir, dag_name="test_dag")
+
+    def simple_function():
+        print("Hello World")
+
+    dag.add_function_to_layer(simple_function, layer_name="hello_layer")
+    dag.write_dag()
+
+    # Check that DAG file and the Python script were created
+    dag_file = os.path.join(temp_dir, "test_dag.dag")
+    assert os.path.exists(dag_file)
+    assert os.path.exists(os.path.join(temp_dir, "simple_function.py"))
+
 
-        def simple_function():
-            print("Hello World")
+def test_dagger_reassigned_dag_dir(temp_dir):
+    """Test that scripts follow dag_dir when it is reassigned after construction."""
+    first_dir = os.path.join(temp_dir, "first")
+    second_dir = os.path.join(temp_dir, "second")
+    dag = Dagger(dag_dir=first_dir, dag_name="moved")
+    os.makedirs(second_dir)
+    dag.dag_dir = second_dir
 
-        dag.add_function_to_layer(simple_function, layer_name="hello_layer")
-        dag.write_dag()
+    def moved_function():
+        print("Moved")
 
-        # Check that DAG file was created
-        dag_file = os.path.join(temp_dir, "test_dag.dag")
-        assert os.path.exists(dag_file)
+    dag.add_function_to_layer(moved_function, layer_name="moved_layer")
+    dag.write_dag()
 
+    assert os.path.exists(os.path.join(second_dir, "moved_function.py"))
+    assert os.path.exists(os.path.join(second_dir, "moved.dag"))
+    assert not os.path.exists(os.path.join(first_dir, "moved_function.py"))
 
-def test_full_workflow():
+
+def test_full_workflow(temp_dir):
     """Test complete workflow from function to DAG layer."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        dag = Dagger(dag_dir=temp_dir, dag_name="full_test")
+    dag = Dagger(dag_dir=temp_dir, dag_name="full_test")
 
-        def step1(input_data: str) -> str:
-            return f"Processed: {input_data}"
+    def step1(input_data: str) -> str:
+        return f"Processed: {input_data}"
 
-        def step2(processed_data: str) -> str:
-            return f"Final: {processed_data}"
+    def step2(processed_data: str) -> str:
+        return f"Final: {processed_data}"
 
-        # Add first layer
-        layer1 = dag.add_function_to_layer(
-            step1, layer_name="process_layer", layer_vars=[{"input_data": "test"}]
-        )
+    # Add first layer
+    layer1 = dag.add_function_to_layer(
+        step1, layer_name="process_layer", layer_vars=[{"input_data": "test"}]
+    )
 
-        # Add second layer with dependency
-        layer2 = dag.add_function_to_layer(
-            step2,
-            layer_name="final_layer",
-            parent_layer_name="process_layer",
-            layer_vars=[{"processed_data": "test_processed"}],
-        )
+    # Add second layer with dependency
+    layer2 = dag.add_function_to_layer(
+        step2,
+        layer_name="final_layer",
+        parent_layer_name="process_layer",
+        layer_vars=[{"processed_data": "test_processed"}],
+    )
 
-        assert len(dag.layer_list) == 2
-        assert "process_layer" in dag.layer_list
-        assert "final_layer" in dag.layer_list
+    assert len(dag.layer_list) == 2
+    assert "process_layer" in dag.layer_list
+    assert "final_layer" in dag.layer_list
 
-        # Write the complete DAG
-        dag.write_dag()
+    # Write the complete DAG
+    dag.write_dag()
 
-        # Verify DAG file exists
-        dag_file = os.path.join(temp_dir, "full_test.dag")
-        assert os.path.exists(dag_file)
+    # Verify DAG file exists
+    dag_file = os.path.join(temp_dir, "full_test.dag")
+    assert os.path.exists(dag_file)
 
 
-def test_error_handling():
+def test_error_handling(temp_dir):
     """Test error handling for invalid inputs."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        dag = Dagger(dag_dir=temp_dir, dag_name="error_test")
+    dag = Dagger(dag_dir=temp_dir, dag_name="error_test")
 
-        # Test invalid function input
-        try:
-            dag.function_to_submit_obj("not_a_function")
-        except TypeError as e:
-            assert str(e) == "Input must be a callable function."
-        else:
-            assert False, "Expected TypeError was not raised."
+    # Test invalid function input
+    try:
+        dag.function_to_submit_obj("not_a_function")
+    except TypeError as e:
+        assert str(e) == "Input must be a callable function."
+    else:
+        assert False, "Expected TypeError was not raised."
 
-        # Test invalid parent layer
-        def test_func():
-            pass
+    # Test invalid parent layer
+    def test_func():
+        pass
 
-        try:
-            dag.add_function_to_layer(test_func, parent_layer_name="nonexistent_layer")
-        except ValueError as e:
-            assert "does not exist in the DAG" in str(e)
-        else:
-            assert False, "Expected ValueError was not raised."
+    try:
+        dag.add_function_to_layer(test_func, parent_layer_name="nonexistent_layer")
+    except ValueError as e:
+        assert "does not exist in the DAG" in str(e)
+    else:
+        assert False, "Expected ValueError was not raised."
+
+    try:
+        dag.add_function_to_layer("not_a_function")
+    except TypeError as e:
+        assert str(e) == "Input must be a callable function."
+    else:
+        assert False, "Expected TypeError was not raised."
 
 
-def test_dagcorator_initialization():
+def test_dagcorator_initialization(temp_dir):
     """Test Dagcorator class initialization."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        dagcorator = Dagcorator(dag_dir=temp_dir, dag_name="test_decorator")
-        assert dagcorator.dag_name == "test_decorator"
-        assert dagcorator.dag_dir == temp_dir
-        assert isinstance(dagcorator.dag, htcondor2.dags.DAG)
-        assert dagcorator._nlayers == 1
-        assert os.path.exists(temp_dir)
+    dagcorator = Dagcorator(dag_dir=temp_dir, dag_name="test_decorator")
+    assert dagcorator.dag_name == "test_decorator"
+    assert dagcorator.dag_dir == temp_dir
+    assert isinstance(dagcorator.dag, htcondor2.dags.DAG)
+    assert dagcorator._nlayers == 1
+    assert os.path.exists(temp_dir)
 
 
-def test_dagcorator_layer_decorator():
+def test_dagcorator_layer_decorator(temp_dir):
     """Test Dagcorator.layer decorator functionality."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        dagcorator = Dagcorator(dag_dir=temp_dir, dag_name="decorator_test")
+    dagcorator = Dagcorator(dag_dir=temp_dir, dag_name="decorator_test")
 
-        @dagcorator.layer(layer_name="test_layer")
-        def sample_function(x: int, y: str) -> str:
-            """A sample function for decorator testing."""
-            return f"Result: {x}, {y}"
+    @dagcorator.layer(layer_name="test_layer")
+    def sample_function(x: int, y: str) -> str:
+        """A sample function for decorator testing."""
+        return f"Result: {x}, {y}"
 
-        # Check that function was added to DAG
-        assert "test_layer" in dagcorator.layer_list
-        assert "sample_function" in dagcorator.submit_functions
-        assert len(dagcorator.job_list) == 1
+    # Check that function was added to DAG
+    assert "test_layer" in dagcorator.layer_list
+    assert "sample_function" in dagcorator.submit_functions
+    assert len(dagcorator.job_list) == 1
 
-        # Check that function still works normally
-        result = sample_function(42, "test")
-        assert result == "Result: 42, test"
+    # Check that function still works normally
+    result = sample_function(42, "test")
+    assert result == "Result: 42, test"
 
-        # Check that function has DAG layer attribute
-        assert hasattr(sample_function, "_dag_layer")
+    # Check that function has DAG layer attribute
+    assert hasattr(sample_function, "_dag_layer")
 
 
-def test_dagcorator_layer_with_parent():
+def test_dagcorator_layer_with_parent(temp_dir):
     """Test Dagcorator layer decorator with parent dependencies."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        dagcorator = Dagcorator(dag_dir=temp_dir, dag_name="parent_test")
+    dagcorator = Dagcorator(dag_dir=temp_dir, dag_name="parent_test")
 
-        @dagcorator.layer(layer_name="parent_layer")
-        def parent_function():
-            return "parent_result"
+    @dagcorator.layer(layer_name="parent_layer")
+    def parent_function():
+        return "parent_result"
 
-        @dagcorator.layer(layer_name="child_layer", parent_layer_name="parent_layer")
-        def child_function():
-            return "child_result"
+    @dagcorator.layer(layer_name="child_layer", parent_layer_name="parent_layer")
+    def child_function():
+        return "child_result"
 
-        assert len(dagcorator.layer_list) == 2
-        assert "parent_layer" in dagcorator.layer_list
-        assert "child_layer" in dagcorator.layer_list
+    assert len(dagcorator.layer_list) == 2
+    assert "parent_layer" in dagcorator.layer_list
+    assert "child_layer" in dagcorator.layer_list
 
 
-def test_dagcorator_layer_with_variables():
+def test_dagcorator_layer_with_variables(temp_dir):
     """Test Dagcorator layer decorator with multiple job variables."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        dagcorator = Dagcorator(dag_dir=temp_dir, dag_name="vars_test")
-
-        @dagcorator.layer(
-            layer_name="multi_job_layer",
-            layer_vars=[
-                {"param1": "value1"},
-                {"param1": "value2"},
-                {"param1": "value3"},
-            ],
-        )
-        def multi_job_function(param1: str):
-            return f"Processed {param1}"
+    dagcorator = Dagcorator(dag_dir=temp_dir, dag_name="vars_test")
+
+    @dagcorator.layer(
+        layer_name="multi_job_layer",
+        layer_vars=[
+            {"param1": "value1"},
+            {"param1": "value2"},
+            {"param1": "value3"},
+        ],
+    )
+    def multi_job_function(param1: str):
+        return f"Processed {param1}"
 
-        assert "multi_job_layer" in dagcorator.layer_list
-        assert "multi_job_function" in dagcorator.submit_functions
+    assert "multi_job_layer" in dagcorator.layer_list
+    assert "multi_job_function" in dagcorator.submit_functions
 
 
-def test_dagcorator_default_layer_name():
+def test_dagcorator_default_layer_name(temp_dir):
     """Test Dagcorator using function name as default layer name."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        dagcorator = Dagcorator(dag_dir=temp_dir, dag_name="default_name_test")
+    dagcorator = Dagcorator(dag_dir=temp_dir, dag_name="default_name_test")
 
-        @dagcorator.layer()
-        def my_custom_function_name():
-            return "result"
+    @dagcorator.layer()
+    def my_custom_function_name():
+        return "result"
 
-        # Should use function name as layer name
-        assert "my_custom_function_name" in dagcorator.layer_list
+    # Should use function name as layer name
+    assert "my_custom_function_name" in dagcorator.layer_list
 
 
-def test_dagcorator_properties():
+def test_dagcorator_properties(temp_dir):
     """Test Dagcorator class properties."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        dagcorator = Dagcorator(dag_dir=temp_dir, dag_name="props_test")
+    dagcorator = Dagcorator(dag_dir=temp_dir, dag_name="props_test")
 
-        @dagcorator.layer(layer_name="prop_test_layer")
-        def test_function():
-            pass
+    @dagcorator.layer(layer_name="prop_test_layer")
+    def test_function():
+        pass
 
-        assert isinstance(dagcorator.submit_functions, dict)
-        assert isinstance(dagcorator.layer_list, list)
-        assert isinstance(dagcorator.job_list, list)
-        assert isinstance(dagcorator.job_names, list)
-        assert "test_function" in dagcorator.submit_functions
+    assert isinstance(dagcorator.submit_functions, dict)
+    assert isinstance(dagcorator.layer_list, list)
+    assert isinstance(dagcorator.job_list, list)
+    assert isinstance(dagcorator.job_names, list)
+    assert "test_function" in dagcorator.submit_functions
 
 
-def test_dagcorator_write_dag():
+def test_dagcorator_write_dag(temp_dir):
     """Test Dagcorator.write_dag method."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        dagcorator = Dagcorator(dag_dir=temp_dir, dag_name="write_test")
+    dagcorator = Dagcorator(dag_dir=temp_dir, dag_name="write_test")
 
-        @dagcorator.layer(layer_name="write_layer")
-        def simple_function():
-            print("Hello from decorator!")
+    @dagcorator.layer(layer_name="write_layer")
+    def simple_function():
+        print("Hello from decorator!")
 
-        dagcorator.write_dag()
+    dagcorator.write_dag()
 
-        # Check that DAG file was created
-        dag_file = os.path.join(temp_dir, "write_test.dag")
-        assert os.path.exists(dag_file)
+    # Check that DAG file was created
+    dag_file = os.path.join(temp_dir, "write_test.dag")
+    assert os.path.exists(dag_file)
 
 
-def test_dagcorator_full_workflow():
+def test_dagcorator_full_workflow(temp_dir):
     """Test complete Dagcorator workflow with multiple layers and dependencies."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        dagcorator = Dagcorator(dag_dir=temp_dir, dag_name="full_decorator_workflow")
+    dagcorator = Dagcorator(dag_dir=temp_dir, dag_name="full_decorator_workflow")
 
-        @dagcorator.layer(layer_name="step1", layer_vars=[{"input": "file1.txt"}])
-        def process_step(input: str) -> str:
-            return f"Processed {input}"
+    @dagcorator.layer(layer_name="step1", layer_vars=[{"input": "file1.txt"}])
+    def process_step(input: str) -> str:
+        return f"Processed {input}"
 
-        @dagcorator.layer(
-            layer_name="step2",
-            parent_layer_name="step1",
-            layer_vars=[{"data": "processed_data"}],
-        )
-        def analyze_step(data: str) -> str:
-            return f"Analyzed {data}"
+    @dagcorator.layer(
+        layer_name="step2",
+        parent_layer_name="step1",
+        layer_vars=[{"data": "processed_data"}],
+    )
+    def analyze_step(data: str) -> str:
+        return f"Analyzed {data}"
 
-        @dagcorator.layer(layer_name="step3", parent_layer_name="step2")
-        def finalize_step() -> str:
-            return "Workflow complete"
+    @dagcorator.layer(layer_name="step3", parent_layer_name="step2")
+    def finalize_step() -> str:
+        return "Workflow complete"
 
-        # Verify DAG structure
-        assert len(dagcorator.layer_list) == 3
-        assert "step1" in dagcorator.layer_list
-        assert "step2" in dagcorator.layer_list
-        assert "step3" in dagcorator.layer_list
+    # Verify DAG structure
+    assert len(dagcorator.layer_list) == 3
+    assert "step1" in dagcorator.layer_list
+    assert "step2" in dagcorator.layer_list
+    assert "step3" in dagcorator.layer_list
 
-        # Verify functions still work
-        assert process_step("test.txt") == "Processed test.txt"
-        assert analyze_step("test_data") == "Analyzed test_data"
-        assert finalize_step() == "Workflow complete"
+    # Verify functions still work
+    assert process_step("test.txt") == "Processed test.txt"
+    assert analyze_step("test_data") == "Analyzed test_data"
+    assert finalize_step() == "Workflow complete"
 
-        # Write and verify DAG file
-        dagcorator.write_dag()
-        dag_file = os.path.join(temp_dir, "full_decorator_workflow.dag")
-        assert os.path.exists(dag_file)
+    # Write and verify DAG file
+    dagcorator.write_dag()
+    dag_file = os.path.join(temp_dir, "full_decorator_workflow.dag")
+    assert os.path.exists(dag_file)
 
 
-def test_dagcorator_error_handling():
+def test_dagcorator_error_handling(temp_dir):
     """Test Dagcorator error handling."""
-    with tempfile.TemporaryDirectory() as temp_dir:
-        dagcorator = Dagcorator(dag_dir=temp_dir, dag_name="error_test")
+    dagcorator = Dagcorator(dag_dir=temp_dir, dag_name="error_test")
 
-        # Test invalid parent layer
-        try:
+    # Test invalid parent layer
+    try:
 
-            @dagcorator.layer(
-                layer_name="child", parent_layer_name="nonexistent_parent"
-            )
-            def invalid_child():
-                pass
+        @dagcorator.layer(
+            layer_name="child", parent_layer_name="nonexistent_parent"
+        )
+        def invalid_child():
+            pass
 
-        except ValueError as e:
-            assert "does not exist in the DAG" in str(e)
-        else:
-            assert False, "Expected ValueError was not raised."
+    except ValueError as e:
+        assert "does not exist in the DAG" in str(e)
+    else:
+        assert False, "Expected ValueError was not raised."
+
+    # Test invalid function input
+    try:
+        dagcorator.layer(layer_name="not_callable")("not_a_function")
+    except TypeError as e:
+        assert str(e) == "Input must be a callable function."
+    else:
+        assert False, "Expected TypeError was not raised."